@@ -13,8 +13,11 @@ class BaseLLM(ABC):
         self.config = config
 
     @abstractmethod
-    def generate(self, prompt, **kwargs):
+    def generate(self, prompt, system=None, **kwargs):
         pass
 
+    def generate_batch(self, prompts, system=None, **kwargs):
+        return [self.generate(prompt, system=system, **kwargs) for prompt in prompts]
+
     def __call__(self, prompt, **kwargs):
         return self.generate(prompt, **kwargs)
\ No newline at end of file
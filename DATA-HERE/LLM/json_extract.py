@@ -0,0 +1,34 @@
+import orjson
+
+def extract_json(text, open_char="{", close_char="}"):
+    start = text.find(open_char)
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    escaped = False
+
+    for i in range(start, len(text)):
+        c = text[i]
+
+        if in_string:
+            if escaped:
+                escaped = False
+            elif c == "\\":
+                escaped = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            in_string = True
+        elif c == open_char:
+            depth += 1
+        elif c == close_char:
+            depth -= 1
+            if depth == 0:
+                try:
+                    return orjson.loads(text[start:i + 1])
+                except orjson.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON in LLM output: {e}") from e
+
+    return None
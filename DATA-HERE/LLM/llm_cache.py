@@ -0,0 +1,104 @@
+import hashlib
+import numpy as np
+import orjson
+from embeddings.paths import base_path
+
+class LLMCache:
+    def __init__(self, embedder=None, threshold=0.95):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.exact = {}
+        self.emb = None
+        self.vals = []
+        self._buf = None
+
+    @staticmethod
+    def key(prompt):
+        # Callers pass system + user text, so editing either prompt misses
+        # instead of returning replies cached for the old wording.
+        return hashlib.sha256(prompt.encode()).hexdigest()
+
+    def embed(self, text):
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts):
+        if self.embedder is None or len(texts) == 0:
+            return [None] * len(texts)
+
+        return self.embedder.embed(texts)
+
+    def get(self, prompt, text_emb=None):
+        hit = self.exact.get(self.key(prompt))
+        if hit is not None or text_emb is None or self.emb is None:
+            return hit
+
+        sims = self.emb @ text_emb
+        best = int(np.argmax(sims))
+        if sims[best] > self.threshold:
+            return self.vals[best]
+
+        return None
+
+    def put(self, prompt, response, text_emb=None):
+        self.exact[self.key(prompt)] = response
+
+        if text_emb is None:
+            return
+
+        row = np.asarray(text_emb, dtype=np.float32)
+        n = len(self.vals)
+
+        # Grow geometrically so inserts stay amortized O(d).
+        if self._buf is None:
+            self._buf = np.empty((16, len(row)), dtype=np.float32)
+        elif n == len(self._buf):
+            self._buf = np.concatenate([self._buf, np.empty_like(self._buf)])
+
+        self._buf[n] = row
+        self.emb = self._buf[:n + 1]
+        self.vals.append(response)
+
+    def fetch(self, prompt, generate, parse, text=None):
+        hit = self.get(prompt)
+        if hit is not None:
+            return parse(hit)
+
+        text_emb = self.embed(text) if text is not None else None
+        hit = self.get(prompt, text_emb)
+        if hit is not None:
+            return parse(hit)
+
+        # Parse before storing so a malformed reply is never cached.
+        response = generate()
+        result = parse(response)
+        self.put(prompt, response, text_emb)
+
+        return result
+
+    def save(self, path):
+        base = base_path(path)
+        emb = np.empty((0, 0), dtype="<f4") if self.emb is None else self.emb
+
+        emb.astype("<f4", copy=False).tofile(base + ".emb.bin")
+        with open(base + ".meta.json", "wb") as f:
+            f.write(orjson.dumps({
+                "shape": list(emb.shape),
+                "exact": self.exact,
+                "vals": self.vals
+            }))
+
+    def load(self, path):
+        base = base_path(path)
+
+        with open(base + ".meta.json", "rb") as f:
+            meta = orjson.loads(f.read())
+
+        self.exact = meta["exact"]
+        self.vals = meta["vals"]
+        self.emb = None
+        self._buf = None
+
+        if self.vals:
+            self._buf = np.fromfile(base + ".emb.bin", dtype="<f4").reshape(meta["shape"])
+            self._buf = self._buf.astype(np.float32, copy=False)
+            self.emb = self._buf[:len(self.vals)]
@@ -1,20 +1,70 @@
-from openai import OpenAI
+import asyncio
+import concurrent.futures
+
+from openai import AsyncOpenAI, OpenAI
 from .LLMWrapper import BaseLLM, LLMResponse
 
 
 class OpenAILLM(BaseLLM):
-    def __init__(self, api_key, model_name="gpt-3.5-turbo", **config):
+    def __init__(self, api_key, model_name="gpt-3.5-turbo", max_retries=5, **config):
         super().__init__(model_name=model_name, **config)
-        self.client = OpenAI(api_key=api_key)
+        self.api_key = api_key
+        # The SDK retries 429s and transient errors with jittered backoff.
+        self.max_retries = max_retries
+        self.client = OpenAI(api_key=api_key, max_retries=max_retries)
 
-    def generate(self, prompt, **kwargs):
+    def generate(self, prompt, system=None, **kwargs):
         res = self.client.chat.completions.create(
             model=self.model_name,
-            messages=[{"role": "user", "content": prompt}],
+            messages=_messages(prompt, system),
             **self.config,
             **kwargs,
         )
 
+        return self._to_response(res)
+
+    async def agenerate(self, prompt, system=None, **kwargs):
+        async with self._async_client() as client:
+            return await self._agenerate(client, prompt, system, **kwargs)
+
+    def generate_batch(self, prompts, system=None, concurrency=50, **kwargs):
+        coro = self._gather(prompts, system, concurrency, **kwargs)
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coro)
+
+        # Already inside an event loop (e.g. Jupyter), so run on a worker thread.
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, coro).result()
+
+    async def _gather(self, prompts, system, concurrency, **kwargs):
+        sem = asyncio.Semaphore(concurrency)
+
+        async with self._async_client() as client:
+            async def run(prompt):
+                async with sem:
+                    return await self._agenerate(client, prompt, system, **kwargs)
+
+            return await asyncio.gather(*(run(p) for p in prompts))
+
+    async def _agenerate(self, client, prompt, system=None, **kwargs):
+        res = await client.chat.completions.create(
+            model=self.model_name,
+            messages=_messages(prompt, system),
+            **self.config,
+            **kwargs,
+        )
+
+        return self._to_response(res)
+
+    def _async_client(self):
+        # Async clients are opened per call/batch so their connection pool
+        # never outlives the event loop it was created on.
+        return AsyncOpenAI(api_key=self.api_key, max_retries=self.max_retries)
+
+    def _to_response(self, res):
         return LLMResponse(
             text=res.choices[0].message.content,
             raw=res,
@@ -23,3 +73,14 @@ class OpenAILLM(BaseLLM):
                 "usage": res.usage.model_dump() if res.usage else None,
             },
         )
+
+
+def _messages(prompt, system=None):
+    # A separate, unchanging system message is a prefix the provider can cache.
+    if system is None:
+        return [{"role": "user", "content": prompt}]
+
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt},
+    ]
@@ -1,50 +1,85 @@
-import json
-import re
 from prompts.preference_extraction_v1 import SYSTEM_PROMPT, USER_PROMPT
 from sessions.conversation_parser import parse_and_combine_by_user
 from config.aspects import ASPECTS
+from .json_extract import extract_json
 
-def extract_preferences(llm, utterance):
-    full_prompt = (
-        SYSTEM_PROMPT.strip()
-        + "\n\n"
-        + USER_PROMPT.format(
-            aspects=", ".join(ASPECTS),
-            utterance=utterance
-        )
+_SYSTEM = SYSTEM_PROMPT.strip()
+_PREFIX = _SYSTEM + "\n\n"
+_ASPECTS_STR = ", ".join(ASPECTS)
+
+def build_preference_prompt(utterance):
+    return USER_PROMPT.format(
+        aspects=_ASPECTS_STR,
+        utterance=utterance
     )
 
-    response = llm.generate(full_prompt)
-    text = response.text
 
-    match = re.search(r"\{[\s\S]*\}", text)
-    if not match:
+def parse_preferences(text):
+    data = extract_json(text, "{", "}")
+    if data is None:
         raise ValueError("No JSON found in LLM output")
 
-    data = json.loads(match.group())
-
     return {
         "hard_preferences": data.get("hard_preferences", []),
         "soft_preferences": data.get("soft_preferences", [])
     }
 
 
-def extract_preferences_from_conversation(llm, conversation):
+def extract_preferences(llm, utterance, cache=None):
+    user_prompt = build_preference_prompt(utterance)
+
+    if cache is None:
+        return parse_preferences(llm.generate(user_prompt, system=_SYSTEM).text)
+
+    return cache.fetch(
+        _PREFIX + user_prompt,
+        lambda: llm.generate(user_prompt, system=_SYSTEM).text,
+        parse_preferences,
+        text=utterance
+    )
+
+
+def extract_preferences_from_conversation(llm, conversation, cache=None):
     combined = parse_and_combine_by_user(conversation)
 
-    results = {}
+    text_blocks = [
+        "\n".join(f"- {u}" for u in utterances)
+        for utterances in combined.values()
+    ]
+    prompts = [build_preference_prompt(block) for block in text_blocks]
+    cache_keys = [_PREFIX + prompt for prompt in prompts]
 
-    for user_id, utterances in combined.items():
-        text_block = "\n".join(
-            f"- {u}" for u in utterances
-        )
+    texts = [None] * len(prompts)
+    text_embs = [None] * len(prompts)
 
-        prefs = extract_preferences(llm, text_block)
+    if cache is not None:
+        texts = [cache.get(key) for key in cache_keys]
 
+        # One batched forward pass for every block that missed the exact tier.
+        pending = [i for i, text in enumerate(texts) if text is None]
+        for i, emb in zip(pending, cache.embed_many([text_blocks[i] for i in pending])):
+            text_embs[i] = emb
+            texts[i] = cache.get(cache_keys[i], emb)
+
+    misses = [i for i, text in enumerate(texts) if text is None]
+    responses = llm.generate_batch([prompts[i] for i in misses], system=_SYSTEM)
+
+    for i, response in zip(misses, responses):
+        texts[i] = response.text
+
+    preferences = [parse_preferences(text) for text in texts]
+
+    # Only cache replies that parsed, so a malformed one is retried next time.
+    if cache is not None:
+        for i in misses:
+            cache.put(cache_keys[i], texts[i], text_embs[i])
+
+    results = {}
+
+    for (user_id, utterances), prefs in zip(combined.items(), preferences):
         results[user_id] = {
             "utterances": utterances,
             "preferences": prefs
         }
 
     return results
-
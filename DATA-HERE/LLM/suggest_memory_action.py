@@ -1,23 +1,35 @@
-import json
-import re
+import orjson
 from prompts.memory_action_v1 import SYSTEM_PROMPT, USER_PROMPT
+from .json_extract import extract_json
 
+_SYSTEM = SYSTEM_PROMPT.strip()
+_PREFIX = _SYSTEM + "\n\n"
 
-def suggest_memory_actions(llm, existing_memory, extracted_preferences):
-    full_prompt = (
-        SYSTEM_PROMPT.strip()
-        + "\n\n"
-        + USER_PROMPT.format(
-            existing_memory=json.dumps(existing_memory, indent=2),
-            new_preferences=json.dumps(extracted_preferences, indent=2)
-        )
+def suggest_memory_actions(llm, existing_memory, extracted_preferences, cache=None):
+    user_prompt = USER_PROMPT.format(
+        existing_memory=_compact_json(existing_memory),
+        new_preferences=_compact_json(extracted_preferences)
     )
 
-    response = llm.generate(full_prompt)
-    text = response.text
+    # Exact-match only: the right actions depend on the current memory state.
+    if cache is None:
+        return _parse_actions(llm.generate(user_prompt, system=_SYSTEM).text)
 
-    match = re.search(r"\[[\s\S]*\]", text)
-    if not match:
+    return cache.fetch(
+        _PREFIX + user_prompt,
+        lambda: llm.generate(user_prompt, system=_SYSTEM).text,
+        _parse_actions
+    )
+
+
+def _parse_actions(text):
+    actions = extract_json(text, "[", "]")
+    if actions is None:
         raise ValueError("No JSON array found in LLM output")
 
-    return json.loads(match.group())
+    return actions
+
+
+def _compact_json(obj):
+    # Compact output keeps prompt tokens down; default=str covers odd types.
+    return orjson.dumps(obj, default=str).decode()
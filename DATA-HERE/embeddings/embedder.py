@@ -1,16 +1,112 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from sentence_transformers import SentenceTransformer
+from tqdm.auto import tqdm
+import numpy as np
 import torch
 
+# Dynamically quantized int8 export published alongside all-MiniLM-L6-v2.
+ONNX_INT8_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+
+TOKENIZER_WORKERS = 4
+PREFETCH_BATCHES = 8
+
+def _mean_pool_normalize(hidden, attention_mask):
+    # The mean's 1/token_count cancels under L2 normalization, so a masked
+    # sum and one rsqrt scale replace the separate pool and normalize passes.
+    mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+    summed = (hidden * mask).sum(1).float()
+    return summed * torch.rsqrt((summed * summed).sum(1, keepdim=True).clamp(min=1e-24))
+
+
 class ReviewEmbedder:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model = SentenceTransformer(model_name, device=device)
-
-    def embed(self, texts):
-        return self.model.encode(
-            texts,
-            batch_size=128,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-            show_progress_bar=True
+    def __init__(self, model_name="all-MiniLM-L6-v2", backend="torch",
+                 onnx_file=None, max_seq_length=128):
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"backend must be 'torch' or 'onnx', got {backend!r}")
+
+        self.backend = backend
+
+        if backend == "onnx":
+            # The int8 file only ships with MiniLM; other models fall back to
+            # sentence-transformers' default onnx/model.onnx.
+            if onnx_file is None and model_name == "all-MiniLM-L6-v2":
+                onnx_file = ONNX_INT8_FILE
+
+            self.device = "cpu"
+            self.model = SentenceTransformer(
+                model_name,
+                device=self.device,
+                backend="onnx",
+                model_kwargs={"file_name": onnx_file} if onnx_file else None
+            )
+        else:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            self.model = SentenceTransformer(model_name, device=self.device)
+            if self.device == "cuda":
+                self.model.half()
+
+        # MiniLM was trained on 128 tokens; longer limits only add padding.
+        self.model.max_seq_length = max_seq_length
+
+    def embed(self, texts, batch_size=128):
+        if self.backend == "onnx":
+            emb = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=True
+            )
+        else:
+            emb = self._embed_pipelined(texts, batch_size)
+
+        return emb
+
+    def _embed_pipelined(self, texts, batch_size):
+        transformer = self.model[0].auto_model
+
+        if len(texts) == 0:
+            return np.empty((0, transformer.config.hidden_size), dtype=np.float32)
+
+        # Length-sorted batches keep padding low, as encode() does.
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        batches = [
+            [texts[i] for i in order[start:start + batch_size]]
+            for start in range(0, len(texts), batch_size)
+        ]
+
+        out = []
+
+        with torch.inference_mode():
+            for tokens in tqdm(self._tokenized(batches), total=len(batches)):
+                tokens = tokens.to(self.device)
+                hidden = transformer(**tokens).last_hidden_state
+                out.append(_mean_pool_normalize(hidden, tokens["attention_mask"]).cpu())
+
+        emb = np.empty((len(texts), out[0].shape[1]), dtype=np.float32)
+        emb[order] = torch.cat(out).numpy()
+
+        return emb
+
+    def _tokenize(self, batch):
+        return self.model.tokenizer(
+            batch,
+            padding=True,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+            return_tensors="pt"
         )
+
+    def _tokenized(self, batches):
+        # Tokenizer threads run up to PREFETCH_BATCHES ahead of the model.
+        with ThreadPoolExecutor(max_workers=TOKENIZER_WORKERS) as pool:
+            pending = deque()
+
+            for batch in batches:
+                pending.append(pool.submit(self._tokenize, batch))
+                if len(pending) >= PREFETCH_BATCHES:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
@@ -1,21 +1,144 @@
+import os
 import numpy as np
+import orjson
+import pandas as pd
+from .paths import base_path
+
+try:
+    import faiss
+
+    # Map saved FAISS indexes read-only so workers share their pages too.
+    FAISS_READ_FLAGS = (
+        getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+        | faiss.IO_FLAG_READ_ONLY
+    )
+except ImportError:
+    faiss = None
+
+# Brute-force NumPy is fine below FAISS_MIN_ROWS; past FAISS_IVF_MIN_ROWS
+# an inverted-file index trades a little recall for sub-linear search.
+FAISS_MIN_ROWS = 100_000
+FAISS_IVF_MIN_ROWS = 1_000_000
+FAISS_NPROBE = 16
 
 class EmbeddingIndex:
     def __init__(self):
         self.embeddings = None
         self.metadata = []
+        self.place_code = None
+        self.unique_places = None
+        self.group_starts = None
+        self.group_ends = None
+        self.faiss_idx = None
 
     def build(self, embeddings, metadata):
-        self.embeddings = embeddings
+        assert embeddings.dtype == np.float32
+        self.embeddings = np.ascontiguousarray(embeddings)
         self.metadata = metadata
+        self._group_by_place()
+        self._build_faiss()
 
     def save(self, path):
-        np.save(path, {
-            "embeddings": self.embeddings,
-            "metadata": self.metadata
-        }, allow_pickle=True)
+        base = base_path(path)
+        emb = np.ascontiguousarray(self.embeddings)
+        dtype = emb.dtype.newbyteorder("<")
+
+        # Raw little-endian rows, readable with np.fromfile or np.memmap.
+        emb.astype(dtype, copy=False).tofile(base + ".emb.bin")
+        with open(base + ".meta.json", "wb") as f:
+            f.write(orjson.dumps({
+                "dtype": dtype.str,
+                "shape": list(emb.shape),
+                "metadata": self.metadata
+            }))
+
+        if self.faiss_idx is not None:
+            faiss.write_index(self.faiss_idx, base + ".faiss")
+        elif os.path.exists(base + ".faiss"):
+            os.remove(base + ".faiss")
 
     def load(self, path):
-        data = np.load(path, allow_pickle=True).item()
-        self.embeddings = data["embeddings"]
-        self.metadata = data["metadata"]
+        base = base_path(path)
+        self.faiss_idx = None
+
+        if os.path.exists(base + ".emb.bin"):
+            with open(base + ".meta.json", "rb") as f:
+                meta = orjson.loads(f.read())
+
+            shape = tuple(meta["shape"])
+            dtype = np.dtype(meta["dtype"])
+
+            # np.memmap refuses empty files, so a zero-row index is built directly.
+            if shape[0] == 0:
+                self.embeddings = np.empty(shape, dtype=dtype)
+            else:
+                # Read-only mapping: worker processes share the same page cache,
+                # so embeddings must never be modified in place.
+                _will_need(base + ".emb.bin")
+                self.embeddings = np.memmap(
+                    base + ".emb.bin", dtype=dtype, mode="r", shape=shape
+                )
+
+            self.metadata = meta["metadata"]
+
+            # Built and trained once by whoever saved the index, never here.
+            if faiss is not None and os.path.exists(base + ".faiss"):
+                self.faiss_idx = faiss.read_index(base + ".faiss", FAISS_READ_FLAGS)
+        else:
+            # Indexes saved before the split format are a single pickled dict.
+            data = np.load(path, allow_pickle=True).item()
+            self.embeddings = data["embeddings"]
+            self.metadata = data["metadata"]
+
+        self._group_by_place()
+        assert self.embeddings.dtype == np.float32
+        assert self.embeddings.flags["C_CONTIGUOUS"]
+
+    def _group_by_place(self):
+        place_ids = np.array([m["place_id"] for m in self.metadata], dtype=object)
+        self.place_code, self.unique_places = pd.factorize(place_ids)
+
+        # Keep each place's reviews in one contiguous block of rows. Saved
+        # indexes are already grouped, so loading them never copies.
+        if np.any(np.diff(self.place_code) < 0):
+            order = np.argsort(self.place_code, kind="stable")
+            self.embeddings = np.ascontiguousarray(self.embeddings[order])
+            self.metadata = [self.metadata[i] for i in order]
+            self.place_code = self.place_code[order]
+
+        places = np.arange(len(self.unique_places))
+        self.group_starts = np.searchsorted(self.place_code, places, side="left")
+        self.group_ends = np.searchsorted(self.place_code, places, side="right")
+
+    def _build_faiss(self):
+        n, d = self.embeddings.shape
+        if faiss is None or n < FAISS_MIN_ROWS:
+            self.faiss_idx = None
+            return
+
+        emb = np.ascontiguousarray(self.embeddings, dtype=np.float32)
+
+        # Inner product equals cosine similarity on normalized embeddings.
+        if n < FAISS_IVF_MIN_ROWS:
+            self.faiss_idx = faiss.IndexFlatIP(d)
+        else:
+            quantizer = faiss.IndexFlatIP(d)
+            self.faiss_idx = faiss.IndexIVFFlat(
+                quantizer, d, int(np.sqrt(n)), faiss.METRIC_INNER_PRODUCT
+            )
+            self.faiss_idx.train(emb)
+            self.faiss_idx.nprobe = FAISS_NPROBE
+
+        self.faiss_idx.add(emb)
+
+
+def _will_need(path):
+    # Start readahead now so the first query doesn't pay the page faults.
+    if not hasattr(os, "posix_fadvise"):
+        return
+
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
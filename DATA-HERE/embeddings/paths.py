@@ -0,0 +1,3 @@
+def base_path(path):
+    # Split-format files share one stem; a trailing .npy from older call sites is dropped.
+    return path[:-len(".npy")] if path.endswith(".npy") else path
@@ -1,23 +1,53 @@
-from collections import defaultdict
+from numba import njit, prange
 import numpy as np
 
 def rank_restaurants(index, query_vec, top_k=10, top_reviews_per_rest=10):
-    sims = index.embeddings @ query_vec
+    return rank_restaurants_many(
+        index, np.reshape(query_vec, (1, -1)), top_k, top_reviews_per_rest
+    )[0]
 
-    scores_by_place = defaultdict(list)
 
-    for sim, meta in zip(sims, index.metadata):
-        scores_by_place[meta["place_id"]].append(sim)
+def rank_restaurants_many(index, queries, top_k=10, top_reviews_per_rest=10):
+    if top_reviews_per_rest < 1:
+        raise ValueError("top_reviews_per_rest must be at least 1")
 
-    avg_scores = {}
-    for place_id, scores in scores_by_place.items():
-        top_scores = sorted(scores, reverse=True)[:top_reviews_per_rest]
-        avg_scores[place_id] = float(np.mean(top_scores))
+    # A float64 query would upcast the whole matrix and skip sgemm.
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    sims = queries @ index.embeddings.T
 
-    ranked = sorted(
-        avg_scores.items(),
-        key=lambda x: x[1],
-        reverse=True
+    return [
+        _rank_places(index, row, top_k, top_reviews_per_rest)
+        for row in sims
+    ]
+
+
+def _rank_places(index, sims, top_k, top_reviews_per_rest):
+    # numba has no float16 kernels; float32 rows pass through without a copy.
+    avg_scores = _groupwise_topk_mean(
+        np.ascontiguousarray(sims, dtype=np.float32),
+        index.group_starts, index.group_ends, top_reviews_per_rest
     )
 
-    return ranked[:top_k]
\ No newline at end of file
+    ranked = np.argsort(-avg_scores, kind="stable")[:top_k]
+
+    return [
+        (index.unique_places[i], float(avg_scores[i]))
+        for i in ranked
+    ]
+
+
+@njit(cache=True, parallel=True)
+def _groupwise_topk_mean(sims, group_starts, group_ends, k):
+    out = np.empty(len(group_starts), dtype=np.float64)
+
+    for g in prange(len(group_starts)):
+        group = sims[group_starts[g]:group_ends[g]]
+        if len(group) > k:
+            group = np.partition(group, len(group) - k)[len(group) - k:]
+
+        s = 0.0
+        for x in group:
+            s += x
+        out[g] = s / len(group)
+
+    return out
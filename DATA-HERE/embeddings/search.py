@@ -5,13 +5,47 @@ class EmbeddingSearch:
         self.index = index
 
     def search(self, query_embedding, top_k=10):
-        sims = self.index.embeddings @ query_embedding
-        top_idx = np.argsort(sims)[::-1][:top_k]
+        return self.search_many(np.reshape(query_embedding, (1, -1)), top_k)[0]
 
+    def search_many(self, queries, top_k=10):
+        if self.index.faiss_idx is not None:
+            return self._search_faiss(queries, top_k)
+
+        # A float64 query would upcast the whole matrix and skip sgemm.
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+
+        # One matrix-matrix product for the whole batch, shape (B, N).
+        sims = queries @ self.index.embeddings.T
+        top_k = min(top_k, sims.shape[1])
+
+        top_idx = np.argpartition(-sims, top_k - 1, axis=1)[:, :top_k]
+        top_sims = np.take_along_axis(sims, top_idx, axis=1)
+        top_idx = np.take_along_axis(top_idx, np.argsort(-top_sims, axis=1), axis=1)
+
+        return [
+            [
+                {
+                    "score": row_sims[i],
+                    "meta": self.index.metadata[i]
+                }
+                for i in row_idx
+            ]
+            for row_sims, row_idx in zip(sims, top_idx)
+        ]
+
+    def _search_faiss(self, queries, top_k):
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        scores, top_idx = self.index.faiss_idx.search(queries, top_k)
+
+        # IVF can return fewer than top_k hits; missing slots are -1.
         return [
-            {
-                "score": sims[i],
-                "meta": self.index.metadata[i]
-            }
-            for i in top_idx
+            [
+                {
+                    "score": score,
+                    "meta": self.index.metadata[i]
+                }
+                for score, i in zip(row_scores, row_idx)
+                if i >= 0
+            ]
+            for row_scores, row_idx in zip(scores, top_idx)
         ]
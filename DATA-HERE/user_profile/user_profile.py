@@ -17,22 +17,25 @@ class UserProfile:
             if values
         }
     
-    def ingest_extracted_preferences(self, extracted_prefs):
+    def ingest_extracted_preferences(self, extracted_prefs, now=None):
+        if now is None:
+            now = datetime.now(timezone.utc)
+
         for group in ["hard_preferences", "soft_preferences"]:
             for pref in extracted_prefs.get(group, []):
                 aspect = pref["aspect"]
                 value = pref["value"].lower()
                 strength = pref["strength"]
 
-                self.memory.setdefault(aspect, {})
-                self.memory[aspect][value] = {
+                self.memory.setdefault(aspect, {})[value] = {
                     "confidence": STRENGTH_TO_CONF[strength],
                     "evidence": 1,
-                    "last_seen": datetime.now(timezone.utc)
+                    "last_seen": now
                 }
 
-    def apply_actions(self, actions):
-        now = datetime.now(timezone.utc)
+    def apply_actions(self, actions, now=None):
+        if now is None:
+            now = datetime.now(timezone.utc)
 
         for act in actions:
             action = act.get("action")
@@ -47,51 +50,43 @@ class UserProfile:
 
             value = value.lower()
             strength = STRENGTH_TO_CONF.get(act.get("strength", "medium"), 0.6)
-            self.memory.setdefault(aspect, {})
+            values = self.memory.setdefault(aspect, {})
+            entry = values.get(value)
 
-            if action == "add" and value not in self.memory[aspect]:
-                self.memory[aspect][value] = {
+            if action == "add" and entry is None:
+                values[value] = {
                     "confidence": strength,
                     "evidence": 1,
                     "last_seen": now
                 }
 
-            elif action == "reinforce" and value in self.memory[aspect]:
-                entry = self.memory[aspect][value]
+            elif action == "reinforce" and entry is not None:
                 entry["confidence"] = (
                     entry["confidence"] * entry["evidence"] + strength
                 ) / (entry["evidence"] + 1)
                 entry["evidence"] += 1
                 entry["last_seen"] = now
 
-            elif action == "weaken" and value in self.memory[aspect]:
-                self.memory[aspect][value]["confidence"] = max(
-                    0.05,
-                    self.memory[aspect][value]["confidence"] * 0.6
-                )
-                self.memory[aspect][value]["last_seen"] = now
+            elif action == "weaken" and entry is not None:
+                entry["confidence"] = max(0.05, entry["confidence"] * 0.6)
+                entry["last_seen"] = now
 
             elif action == "merge":
                 target = act.get("target")
                 if not target:
                     continue
 
-                target = target.lower()
-
-                if target not in self.memory[aspect]:
+                target_entry = values.get(target.lower())
+                if target_entry is None:
                     continue
 
-                if value in self.memory[aspect]:
-                    self.memory[aspect][target]["confidence"] = max(
-                        self.memory[aspect][target]["confidence"],
-                        self.memory[aspect][value]["confidence"]
+                if entry is not None and entry is not target_entry:
+                    target_entry["confidence"] = max(
+                        target_entry["confidence"],
+                        entry["confidence"]
                     )
-                    self.memory[aspect][target]["evidence"] += \
-                        self.memory[aspect][value]["evidence"]
-
-                    del self.memory[aspect][value]
-
-                self.memory[aspect][target]["last_seen"] = now
+                    target_entry["evidence"] += entry["evidence"]
 
+                    del values[value]
 
-    
\ No newline at end of file
+                target_entry["last_seen"] = now